@@ -1,13 +1,24 @@
 from fastapi import FastAPI, HTTPException
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import RedirectResponse
+from fastapi.responses import ORJSONResponse, RedirectResponse
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, NamedTuple, Optional, Sequence
 import tiktoken
-from collections import defaultdict
 import numpy as np
+import functools
+import logging
+import os
 
-app = FastAPI()
+logger = logging.getLogger(__name__)
+
+# Most next-word predictions returned for a context; the UI never needs more
+MAX_PREDICTIONS = 50
+
+# orjson serializes the nested prediction responses much faster than the stdlib encoder
+app = FastAPI(default_response_class=ORJSONResponse)
+
+# Loading the BPE tables is expensive, so do it once at import time
+_ENC = tiktoken.get_encoding("cl100k_base")
 
 # Enable CORS
 app.add_middleware(
@@ -15,11 +26,12 @@ app.add_middleware(
     allow_origins=[
         "https://llm-demo-henna.vercel.app",  # Production frontend
         "http://localhost:5173",              # Local development frontend
-        "https://llm-demo-*",                # Any Vercel preview deployments
-        "https://*.vercel.app",              # Any Vercel app
     ],
+    # allow_origins only matches exact strings, so Vercel preview deployments
+    # (and any other Vercel app) are matched with a regex instead
+    allow_origin_regex=r"https://[\w-]+\.vercel\.app",
     allow_credentials=True,
-    allow_methods=["*"],
+    allow_methods=["GET", "POST"],
     allow_headers=["*"],
 )
 
@@ -61,73 +73,193 @@ class ContextPredictionResponse(BaseModel):
     context_options: List[ContextOption]
     predictions: List[ContextPrediction]
 
-def tokenize_text(text: str) -> tuple[List[str], List[int]]:
-    """Tokenize text using tiktoken."""
-    enc = tiktoken.get_encoding("cl100k_base")
-    # Don't lowercase the text to preserve case sensitivity
-    token_ids = enc.encode(text)
-    tokens = [enc.decode([id]) for id in token_ids]
-    return tokens, token_ids
-
-def create_ngram_model(sentences: List[str], n: int = 1) -> Dict[tuple, Dict[str, int]]:
-    """Create an n-gram model from the sentences."""
-    print(f"\nCreating {n}-gram model from {len(sentences)} sentences")
-    model = defaultdict(lambda: defaultdict(int))
-    
-    for sentence in sentences:
-        words = sentence.strip().split()
-        print(f"Processing sentence: {words}")
-        
-        if len(words) < n + 1:
-            print(f"Skipping sentence - too short ({len(words)} < {n + 1})")
-            continue
-            
-        for i in range(len(words) - n):
-            context = tuple(words[i:i+n])
-            next_word = words[i+n]
-            model[context][next_word] += 1
-            print(f"  Added: {context} -> {next_word}")
-            
-    print(f"Model contains {len(model)} unique contexts")
-    return model
+def decode_tokens(token_ids: List[int]) -> List[str]:
+    """Decode each token id to its text in a single call into tiktoken."""
+    return [b.decode("utf-8", errors="replace") for b in _ENC.decode_tokens_bytes(token_ids)]
+
+class TrieNode:
+    """A trie node; the path of word ids from the root to it spells out an n-gram."""
+    __slots__ = ("children", "count", "total", "next_ids", "counts", "best_next_id")
+
+    def __init__(self):
+        self.children: Dict[int, "TrieNode"] = {}
+        self.count = 0  # Occurrences of this node's word after its parent's context
+        self.total = 0  # Sum of the next-word counts
+        # Next word ids and counts as parallel arrays. Nodes at depth max_n keep
+        # these but no child nodes, since no longer context is ever looked up.
+        self.next_ids: Optional[np.ndarray] = None
+        self.counts: Optional[np.ndarray] = None
+        # Most frequent next word id (the first seen on ties), used for completions
+        self.best_next_id = -1
+
+class NGramTrie(NamedTuple):
+    """Word-level trie holding every n-gram model up to max_n.
+
+    The n-gram model for a context of n words is the node reached by walking
+    those words from the root; its children are the candidate next words.
+    """
+    max_n: int
+    vocab: Dict[str, int]
+    id_to_word: List[str]
+    root: TrieNode
+
+def encode_sentences(split_sentences: Sequence[Sequence[str]]) -> tuple[Dict[str, int], List[str], List[np.ndarray]]:
+    """Map every word to an integer id and encode each split sentence as an id array."""
+    vocab: Dict[str, int] = {}
+    encoded = [
+        np.array([vocab.setdefault(word, len(vocab)) for word in words], dtype=np.int32)
+        for words in split_sentences
+    ]
+    return vocab, list(vocab), encoded
+
+def build_ngram_trie(split_sentences: Sequence[Sequence[str]], max_n: int = 4) -> NGramTrie:
+    """Create the 1..max_n-gram models from the split sentences as a single trie."""
+    logger.debug("Creating trie of up to %d-gram contexts from %d sentences", max_n, len(split_sentences))
+    vocab, id_to_word, encoded = encode_sentences(split_sentences)
+    root = TrieNode()
+
+    ids = np.concatenate(encoded).astype(np.int64) if encoded else np.empty(0, dtype=np.int64)
+    lengths = np.array([len(sentence_ids) for sentence_ids in encoded], dtype=np.int64)
+    # Number of words from each position to the end of its sentence
+    remaining = np.repeat(np.cumsum(lengths), lengths) - np.arange(len(ids))
+
+    # The trie is filled one level at a time, with the counting done in NumPy.
+    # At depth k every position starts a k-gram, identified by its parent
+    # (k-1)-gram group and its last word id. np.unique then gives the distinct
+    # k-grams and their counts, so Python only touches each distinct n-gram
+    # once rather than every word occurrence.
+    parents = [root]
+    groups = np.zeros(len(ids), dtype=np.int64)
+    positions = np.arange(len(ids))
+    for k in range(1, max_n + 2):
+        positions = positions[remaining[positions] >= k]
+        if not len(positions):
+            break
+
+        keys = groups[positions] * len(vocab) + ids[positions + k - 1]
+        unique_keys, first_seen, inverse, counts = np.unique(
+            keys, return_index=True, return_inverse=True, return_counts=True
+        )
+        # Renumber the groups in order of first occurrence, so every node's
+        # children end up in the order they first appear in the sentences
+        order = np.argsort(first_seen, kind="stable")
+        rank = np.empty_like(order)
+        rank[order] = np.arange(len(order))
+        groups[positions] = rank[inverse.ravel()]
+        unique_keys, counts = unique_keys[order], counts[order]
+        parent_groups, next_ids = np.divmod(unique_keys, len(vocab))
+
+        # Sort the new k-grams by parent, keeping first-seen order within a
+        # parent, so each parent's next ids and counts are views of one slice
+        by_parent = np.argsort(parent_groups, kind="stable")
+        sorted_ids, sorted_counts = next_ids[by_parent].astype(np.int32), counts[by_parent]
+        starts = np.flatnonzero(np.r_[True, np.diff(parent_groups[by_parent]) != 0])
+        stops = np.r_[starts[1:], len(by_parent)]
+        totals = np.add.reduceat(sorted_counts, starts)
+        # Argmax of the counts within each slice: the first index holding the slice maximum
+        is_max = sorted_counts == np.repeat(np.maximum.reduceat(sorted_counts, starts), stops - starts)
+        best = np.minimum.reduceat(np.where(is_max, np.arange(len(sorted_counts)), len(sorted_counts)), starts)
+        for parent_group, start, stop, total, best_next_id in zip(
+            parent_groups[by_parent][starts].tolist(), starts.tolist(), stops.tolist(),
+            totals.tolist(), sorted_ids[best].tolist()
+        ):
+            parent = parents[parent_group]
+            parent.next_ids = sorted_ids[start:stop]
+            parent.counts = sorted_counts[start:stop]
+            parent.total = total
+            parent.best_next_id = best_next_id
+
+        if k == max_n + 1:
+            # Nothing is ever looked up below a max_n-word context, so the
+            # deepest level only needs the counts stored on its parents
+            break
+        level = []
+        for parent_group, next_id, count in zip(parent_groups.tolist(), next_ids.tolist(), counts.tolist()):
+            node = parents[parent_group].children[next_id] = TrieNode()
+            node.count = count
+            level.append(node)
+        parents = level
+
+    logger.debug("Trie contains %d top-level words", len(root.children))
+    return NGramTrie(max_n, vocab, id_to_word, root)
+
+@functools.lru_cache(maxsize=32)
+def _cached_models(split_sentences: tuple[tuple[str, ...], ...], max_n: int) -> NGramTrie:
+    """Build the n-gram trie once per distinct set of sentences.
 
-def get_next_word_probabilities(context: tuple, model: Dict[tuple, Dict[str, int]]) -> Dict[str, float]:
+    The frontend sends the same sentences to every endpoint, so repeat calls
+    reuse the trie instead of rebuilding it. The trie is never mutated after
+    it is built, which makes sharing it between requests safe.
+    """
+    return build_ngram_trie(split_sentences, max_n=max_n)
+
+def walk_context(context_ids: List[Optional[int]], trie: NGramTrie) -> Optional[TrieNode]:
+    """Follow the context ids down from the root; None if the context was never seen."""
+    node = trie.root
+    for word_id in context_ids:
+        node = node.children.get(word_id)
+        if node is None:
+            return None
+    return node
+
+def find_context(context: tuple, trie: NGramTrie) -> Optional[TrieNode]:
+    """Get the trie node for a context of words, if it has any next words."""
+    node = walk_context([trie.vocab.get(word) for word in context], trie)
+    return node if node is not None and node.total else None
+
+def get_next_word_probabilities(context: tuple, trie: NGramTrie) -> Dict[str, float]:
     """Get probability distribution for the next word given a context."""
-    print(f"\nGetting probabilities for context: {context}")
+    logger.debug("Getting probabilities for context: %s", context)
+    node = find_context(context, trie)
     
-    if context not in model:
-        print(f"Context {context} not found in model")
-        print("Available contexts:", list(model.keys())[:5])  # Print first 5 contexts for debugging
+    if node is None:
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("Context %s not found in model", context)
+            logger.debug("Known first words: %s", [trie.id_to_word[i] for i in list(trie.root.children)[:5]])
         return {}
         
-    total = sum(model[context].values())
-    probabilities = {word: count/total for word, count in model[context].items()}
-    print(f"Found {len(probabilities)} possible next words")
-    print("Top 5 predictions:", sorted(probabilities.items(), key=lambda x: x[1], reverse=True)[:5])
+    probs = node.counts / node.total
+    id_to_word = trie.id_to_word
+    probabilities = {id_to_word[i]: p for i, p in zip(node.next_ids.tolist(), probs.tolist())}
+    if logger.isEnabledFor(logging.DEBUG):
+        logger.debug("Found %d possible next words", len(probabilities))
+        logger.debug("Top 5 predictions: %s", sorted(probabilities.items(), key=lambda x: x[1], reverse=True)[:5])
     
     return probabilities
 
-def complete_sentence(context: List[str], model: Dict[tuple, Dict[str, int]], max_length: int = 10) -> str:
-    """Complete a sentence using the n-gram model."""
-    if not model:  # Handle empty model case
-        return ' '.join(context)
-        
+def get_top_predictions(context: tuple, trie: NGramTrie, limit: int = MAX_PREDICTIONS) -> List[ContextPrediction]:
+    """Get the most likely next words for a context, most probable first."""
+    node = find_context(context, trie)
+    if node is None:
+        return []
+
+    # Stable sort so equally likely words keep the order they were first seen in
+    order = np.argsort(-node.counts, kind="stable")[:limit]
+    probs = node.counts[order] / node.total
+    id_to_word = trie.id_to_word
+    return [
+        ContextPrediction.model_construct(word=id_to_word[i], probability=p)
+        for i, p in zip(node.next_ids[order].tolist(), probs.tolist())
+    ]
+
+def complete_sentence(context: List[str], trie: NGramTrie, n: int, max_length: int = 10) -> str:
+    """Complete a sentence using the n-gram model with n words of context."""
     current_sentence = context.copy()
-    # Get n from first key, or default to 1 if model is empty
-    n = len(next(iter(model.keys()))) if model else 1
+    current_ids = [trie.vocab.get(word) for word in context]
     
     while len(current_sentence) < max_length:
         if len(current_sentence) < n:
             break
             
-        current_context = tuple(current_sentence[-(n):])
-        probs = get_next_word_probabilities(current_context, model)
+        node = walk_context(current_ids[-n:], trie)
         
-        if not probs:
+        if node is None or not node.total:
             break
             
-        next_word = max(probs.items(), key=lambda x: x[1])[0]
+        next_id = node.best_next_id
+        next_word = trie.id_to_word[next_id]
         current_sentence.append(next_word)
+        current_ids.append(next_id)
         
         # Stop if we hit a period
         if next_word.endswith('.'):
@@ -136,120 +268,75 @@ def complete_sentence(context: List[str], model: Dict[tuple, Dict[str, int]], ma
     return ' '.join(current_sentence)
 
 @app.post("/process", response_model=CompletionResponse)
-async def process_sentences(input_data: SentencesInput):
+def process_sentences(input_data: SentencesInput):
     try:
-        # Tokenize sentences
-        tokenized_results = []
         processed_sentences = [s.strip() for s in input_data.sentences if s.strip()]
-        
-        for sentence in processed_sentences:
-            tokens, token_ids = tokenize_text(sentence)
-            tokenized_results.append(TokenizedSentence(
+        split_sentences = [s.split() for s in processed_sentences]
+
+        # Tokenize all sentences in one batch; tiktoken spreads the work over a thread pool.
+        # Don't lowercase the text to preserve case sensitivity
+        all_ids = _ENC.encode_ordinary_batch(processed_sentences, num_threads=os.cpu_count())
+        tokenized_results = [
+            TokenizedSentence.model_construct(
                 original=sentence,
-                tokens=tokens,
+                tokens=decode_tokens(token_ids),
                 token_ids=token_ids
-            ))
+            )
+            for sentence, token_ids in zip(processed_sentences, all_ids)
+        ]
         
         # Create n-gram models from all sentences
-        one_gram_model = create_ngram_model(processed_sentences, n=1)
-        two_gram_model = create_ngram_model(processed_sentences, n=2)
-        three_gram_model = create_ngram_model(processed_sentences, n=3)
-        four_gram_model = create_ngram_model(processed_sentences, n=4)
+        trie = _cached_models(tuple(map(tuple, split_sentences)), 4)
         
-        # Generate predictions
-        one_word_predictions = []
-        two_word_predictions = []
-        three_word_predictions = []
-        four_word_predictions = []
+        # Generate n-word predictions for n = 1..4 (for sentences with at least n words)
+        predictions = {n: [] for n in range(1, 5)}
         
-        for sentence in processed_sentences:
-            words = sentence.split()
-            
-            # 1-word predictions (for sentences with at least 1 word)
-            if len(words) >= 1:
-                context_1 = [words[0]]
-                probs_1 = get_next_word_probabilities(tuple(context_1), one_gram_model)
-                completed_1 = complete_sentence(context_1, one_gram_model)
-                
-                one_word_predictions.append(PredictionResult(
-                    context=' '.join(context_1),
-                    probabilities=probs_1,
-                    completed_sentence=completed_1
-                ))
-            
-            # 2-word predictions (for sentences with at least 2 words)
-            if len(words) >= 2:
-                context_2 = words[:2]
-                probs_2 = get_next_word_probabilities(tuple(context_2), two_gram_model)
-                completed_2 = complete_sentence(context_2, two_gram_model)
-                
-                two_word_predictions.append(PredictionResult(
-                    context=' '.join(context_2),
-                    probabilities=probs_2,
-                    completed_sentence=completed_2
-                ))
-
-            # 3-word predictions (for sentences with at least 3 words)
-            if len(words) >= 3:
-                context_3 = words[:3]
-                probs_3 = get_next_word_probabilities(tuple(context_3), three_gram_model)
-                completed_3 = complete_sentence(context_3, three_gram_model)
-                
-                three_word_predictions.append(PredictionResult(
-                    context=' '.join(context_3),
-                    probabilities=probs_3,
-                    completed_sentence=completed_3
-                ))
-
-            # 4-word predictions (for sentences with at least 4 words)
-            if len(words) >= 4:
-                context_4 = words[:4]
-                probs_4 = get_next_word_probabilities(tuple(context_4), four_gram_model)
-                completed_4 = complete_sentence(context_4, four_gram_model)
-                
-                four_word_predictions.append(PredictionResult(
-                    context=' '.join(context_4),
-                    probabilities=probs_4,
-                    completed_sentence=completed_4
+        for words in split_sentences:
+            for n in range(1, min(len(words), 4) + 1):
+                context = words[:n]
+                predictions[n].append(PredictionResult.model_construct(
+                    context=' '.join(context),
+                    probabilities=get_next_word_probabilities(tuple(context), trie),
+                    completed_sentence=complete_sentence(context, trie, n=n)
                 ))
         
         return CompletionResponse(
             tokenized_sentences=tokenized_results,
-            one_word_predictions=one_word_predictions,
-            two_word_predictions=two_word_predictions,
-            three_word_predictions=three_word_predictions,
-            four_word_predictions=four_word_predictions
+            one_word_predictions=predictions[1],
+            two_word_predictions=predictions[2],
+            three_word_predictions=predictions[3],
+            four_word_predictions=predictions[4]
         )
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/get_context_options/{n_words}", response_model=ContextPredictionResponse)
-async def get_context_options(n_words: int, input_data: SentencesInput):
+def get_context_options(n_words: int, input_data: SentencesInput):
     try:
         processed_sentences = [s.strip() for s in input_data.sentences if s.strip()]
-        print(f"\n=== Processing {n_words}-word contexts for sentences ===")
-        print(f"Input sentences: {processed_sentences}")
+        split_sentences = [s.split() for s in processed_sentences]
+        logger.debug("=== Processing %d-word contexts for sentences ===", n_words)
+        logger.debug("Input sentences: %s", processed_sentences)
         
         context_options_dict = {}
         predictions = []
 
-        for sentence_idx, sentence in enumerate(processed_sentences):
-            words = sentence.split()
-            print(f"\nProcessing sentence {sentence_idx + 1}: '{sentence}'")
-            print(f"Words: {words}")
+        for sentence_idx, (sentence, words) in enumerate(zip(processed_sentences, split_sentences)):
+            logger.debug("Processing sentence %d: '%s'", sentence_idx + 1, sentence)
+            logger.debug("Words: %s", words)
             
             if len(words) < n_words:
-                print(f"Skipping sentence - too short ({len(words)} < {n_words})")
+                logger.debug("Skipping sentence - too short (%d < %d)", len(words), n_words)
                 continue
 
             if n_words == 1:
-                print("\nGenerating 1-word prediction options:")
+                logger.debug("Generating 1-word prediction options:")
                 # a) First words in sentences
                 if len(words) >= 1:
                     unique_key = f"{sentence_idx}:first:{words[0]}"
-                    print(f"  Adding first word option: '{words[0]}'")
-                    context_options_dict[unique_key] = ContextOption(
+                    logger.debug("  Adding first word option: '%s'", words[0])
+                    context_options_dict[unique_key] = ContextOption.model_construct(
                         context=words[0],
                         highlighted_words=[words[0]],
                         non_highlighted_words=[]
@@ -258,8 +345,8 @@ async def get_context_options(n_words: int, input_data: SentencesInput):
                 # b) Second words with first word as context
                 if len(words) >= 2:
                     unique_key = f"{sentence_idx}:second:{words[1]}"
-                    print(f"  Adding second word option: context='{words[0]}', highlight='{words[1]}'")
-                    context_options_dict[unique_key] = ContextOption(
+                    logger.debug("  Adding second word option: context='%s', highlight='%s'", words[0], words[1])
+                    context_options_dict[unique_key] = ContextOption.model_construct(
                         context=' '.join([words[0], words[1]]),  # Include both context and highlighted word
                         highlighted_words=[words[1]],
                         non_highlighted_words=[words[0]]
@@ -268,8 +355,8 @@ async def get_context_options(n_words: int, input_data: SentencesInput):
                 # c) Third words with first two words as context
                 if len(words) >= 3:
                     unique_key = f"{sentence_idx}:third:{words[2]}"
-                    print(f"  Adding third word option: context='{words[0]} {words[1]}', highlight='{words[2]}'")
-                    context_options_dict[unique_key] = ContextOption(
+                    logger.debug("  Adding third word option: context='%s %s', highlight='%s'", words[0], words[1], words[2])
+                    context_options_dict[unique_key] = ContextOption.model_construct(
                         context=' '.join([*words[:2], words[2]]),  # Include both context and highlighted word
                         highlighted_words=[words[2]],
                         non_highlighted_words=words[:2]
@@ -278,20 +365,22 @@ async def get_context_options(n_words: int, input_data: SentencesInput):
                 # Continue for subsequent words
                 for i in range(3, len(words)):
                     unique_key = f"{sentence_idx}:pos{i}:{words[i]}"
-                    print(f"  Adding word {i+1} option: context='{' '.join(words[:i])}', highlight='{words[i]}'")
-                    context_options_dict[unique_key] = ContextOption(
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("  Adding word %d option: context='%s', highlight='%s'", i + 1, ' '.join(words[:i]), words[i])
+                    context_options_dict[unique_key] = ContextOption.model_construct(
                         context=' '.join([*words[:i], words[i]]),  # Include both context and highlighted word
                         highlighted_words=[words[i]],
                         non_highlighted_words=words[:i]
                     )
             else:
-                print(f"\nGenerating {n_words}-word prediction options:")
+                logger.debug("Generating %d-word prediction options:", n_words)
                 # a) First n words in sentence
                 if len(words) >= n_words:
                     first_n_words = words[:n_words]
                     unique_key = f"{sentence_idx}:first:{' '.join(first_n_words)}"
-                    print(f"  Adding first {n_words} words option: highlight='{' '.join(first_n_words)}'")
-                    context_options_dict[unique_key] = ContextOption(
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("  Adding first %d words option: highlight='%s'", n_words, ' '.join(first_n_words))
+                    context_options_dict[unique_key] = ContextOption.model_construct(
                         context=' '.join(first_n_words),
                         highlighted_words=first_n_words,
                         non_highlighted_words=[]
@@ -302,8 +391,9 @@ async def get_context_options(n_words: int, input_data: SentencesInput):
                     highlighted = words[i:i + n_words]
                     context = words[:i]
                     unique_key = f"{sentence_idx}:pos{i}:{' '.join(highlighted)}"
-                    print(f"  Adding position {i} option: context='{' '.join(context)}', highlight='{' '.join(highlighted)}'")
-                    context_options_dict[unique_key] = ContextOption(
+                    if logger.isEnabledFor(logging.DEBUG):
+                        logger.debug("  Adding position %d option: context='%s', highlight='%s'", i, ' '.join(context), ' '.join(highlighted))
+                    context_options_dict[unique_key] = ContextOption.model_construct(
                         context=' '.join([*context, *highlighted]),  # Include both context and highlighted words
                         highlighted_words=highlighted,
                         non_highlighted_words=context
@@ -315,75 +405,70 @@ async def get_context_options(n_words: int, input_data: SentencesInput):
         # Sort context options:
         # First, options with no prefix (first words in sentences)
         # Then, options with prefixes, sorted by prefix length
+        # list.sort computes each key once up front, so every option is joined
+        # and lowercased exactly once; ties keep insertion order (stable sort)
         context_options.sort(key=lambda x: (
             len(x.non_highlighted_words),  # Sort by prefix length first
             ' '.join(x.non_highlighted_words).lower(),  # Then by prefix text
             ' '.join(x.highlighted_words).lower()  # Then by highlighted text
         ))
 
-        print("\n=== Final context options ===")
-        for opt in context_options:
-            print(f"Context: {opt.context}")
-            print(f"  Highlighted: {opt.highlighted_words}")
-            print(f"  Non-highlighted: {opt.non_highlighted_words}\n")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("=== Final context options ===")
+            for opt in context_options:
+                logger.debug("Context: %s", opt.context)
+                logger.debug("  Highlighted: %s", opt.highlighted_words)
+                logger.debug("  Non-highlighted: %s", opt.non_highlighted_words)
 
         # Get predictions for the first context option
         if context_options:
-            model = create_ngram_model(processed_sentences, n=n_words)
+            # A trie of depth 4 also answers shorter contexts, so share it with /process
+            trie = _cached_models(tuple(map(tuple, split_sentences)), max(n_words, 4))
             context_tuple = tuple(context_options[0].highlighted_words)
-            probs = get_next_word_probabilities(context_tuple, model)
-            predictions = [
-                ContextPrediction(word=word, probability=prob)
-                for word, prob in sorted(probs.items(), key=lambda x: x[1], reverse=True)
-            ]
+            predictions = get_top_predictions(context_tuple, trie)
 
         return ContextPredictionResponse(
             context_options=context_options,
             predictions=predictions
         )
     except Exception as e:
-        print(f"Error in get_context_options: {str(e)}")
+        logger.error("Error in get_context_options: %s", e)
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/get_predictions/{n_words}", response_model=List[ContextPrediction])
-async def get_predictions(n_words: int, context: str, input_data: SentencesInput):
+def get_predictions(n_words: int, context: str, input_data: SentencesInput):
     try:
-        print(f"\n=== Getting predictions for {n_words} words with context: '{context}' ===")
+        logger.debug("=== Getting predictions for %d words with context: '%s' ===", n_words, context)
         processed_sentences = [s.strip() for s in input_data.sentences if s.strip()]
-        print(f"Input sentences: {processed_sentences}")
+        logger.debug("Input sentences: %s", processed_sentences)
 
-        # Create n-gram model using n_words as the context size
-        model = create_ngram_model(processed_sentences, n=n_words)
+        # Create (or reuse) n-gram models with up to n_words of context
+        split_sentences = tuple(tuple(s.split()) for s in processed_sentences)
+        trie = _cached_models(split_sentences, max(n_words, 4))
         
         # Get the context words
         context_words = context.split()
-        print(f"Context words: {context_words}")
+        logger.debug("Context words: %s", context_words)
         
         # Use the last n_words as context
         context_tuple = tuple(context_words[-n_words:])
-        print(f"Using context tuple: {context_tuple}")
+        logger.debug("Using context tuple: %s", context_tuple)
         
-        # Get probabilities for the next word
-        probs = get_next_word_probabilities(context_tuple, model)
-        print(f"Generated probabilities: {probs}")
-        
-        # Convert to list of predictions
-        predictions = [
-            ContextPrediction(word=word, probability=prob)
-            for word, prob in sorted(probs.items(), key=lambda x: x[1], reverse=True)
-        ]
+        # Get the most likely next words. A context shorter than n_words
+        # would otherwise land on a lower-order model in the trie.
+        predictions = get_top_predictions(context_tuple, trie) if len(context_tuple) == n_words else []
         
-        print(f"Returning {len(predictions)} predictions")
-        for pred in predictions[:5]:  # Print top 5 predictions for debugging
-            print(f"  {pred.word}: {pred.probability:.2%}")
+        logger.debug("Returning %d predictions", len(predictions))
+        for pred in predictions[:5]:  # Log top 5 predictions for debugging
+            logger.debug("  %s: %.2f%%", pred.word, pred.probability * 100)
             
         return predictions
     except Exception as e:
-        print(f"Error in get_predictions: {str(e)}")
-        print(f"Context: {context}")
-        print(f"n_words: {n_words}")
+        logger.error("Error in get_predictions: %s (context=%r, n_words=%d)", e, context, n_words)
         raise HTTPException(status_code=500, detail=str(e))
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000) 
\ No newline at end of file
+    # One worker process per core, since the handlers are CPU-bound. Multiple
+    # workers need the app as an import string rather than the object.
+    uvicorn.run("main:app", host="0.0.0.0", port=8000, workers=os.cpu_count(), loop="uvloop", http="httptools") 
\ No newline at end of file